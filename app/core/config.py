@@ -1,7 +1,14 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
+class ModelRoutingRule(BaseModel):
+    model: str
+    min_length: Optional[int] = None
+    max_length: Optional[int] = None
+    styles: Optional[List[str]] = None
+
 class Settings(BaseSettings):
     # API Configuration
     API_V1_STR: str = "/api/v1"
@@ -19,10 +26,69 @@ class Settings(BaseSettings):
     # Processing Configuration
     MAX_REQUESTS_PER_MINUTE: int = 900
     PROCESSING_BATCH_SIZE: int = 5
-    SELECT_BEST_SENTENCE: bool = True
+    # SELECT_BEST_SENTENCE is the only switch: when on, each call asks for
+    # CANDIDATE_COUNT candidates and keeps the best-scoring one; when off, one.
+    # Completion tokens are billed per candidate, so it multiplies output cost.
+    SELECT_BEST_SENTENCE: bool = False
+    CANDIDATE_COUNT: int = 3
+    MAX_CONCURRENT_UPSTREAM_CALLS: int = 20
+    ARCHIVE_MAX_FILES: int = 1000
+    ARCHIVE_MAX_TOTAL_BYTES: int = 200 * 1024 * 1024
+    DISCONNECT_POLL_INTERVAL: float = 0.5
+
+    # Admission control
+    ADMISSION_MAX_QUEUE_SECONDS: float = 120.0
+    ADMISSION_INITIAL_SERVICE_TIME: float = 3.0
+
+    # Usage metering (0 = no token quota). When USAGE_API_KEYS is set, processing
+    # endpoints require one of these keys in X-API-Key and usage is metered per
+    # key. When it is empty, metering is off and requests are only limited by
+    # the per-IP rate limit and admission control.
+    USAGE_API_KEYS: List[str] = []
+    USAGE_DB_PATH: str = "usage.db"
+    USAGE_FLUSH_INTERVAL: float = 10.0
+    USAGE_TOKEN_QUOTA: int = 0
+
+    # Diagnostics (admin endpoints are disabled while ADMIN_API_KEY is empty)
+    ADMIN_API_KEY: str = ""
+    PROFILE_MAX_SECONDS: float = 60.0
+    LOOP_LAG_MONITOR_ENABLED: bool = True
+    LOOP_LAG_THRESHOLD_MS: float = 200.0
+    LOOP_LAG_CHECK_INTERVAL_MS: float = 50.0
+    LOOP_STALL_CAPTURES: int = 50
+
+    # Job Configuration
+    JOB_LONG_POLL_MAX_SECONDS: float = 30.0
+    JOB_PAGE_MAX_LIMIT: int = 500
+    JOB_DECODED_CACHE_SIZE: int = 16
+    # gzip level for finished job payloads; low levels are much faster and
+    # compress the duplicated section texts nearly as well
+    JOB_PAYLOAD_COMPRESSION_LEVEL: int = 3
+
+    # Near-duplicate reuse
+    SIMILARITY_REUSE_ENABLED: bool = False
+    # Lower thresholds mean narrower LSH bands and more entries scanned per lookup
+    # (about 12% at 0.85, see SimilarityIndex)
+    SIMILARITY_THRESHOLD: float = 0.85
+    SIMILARITY_INDEX_MAX_ENTRIES: int = 10000
 
     # Model Configuration
     GPT_MODEL: str = "ft:gpt-3.5-turbo-0125:personal::9hpCfvVt"
+    # First matching rule picks the model; unmatched chunks use GPT_MODEL
+    MODEL_ROUTING_RULES: List[ModelRoutingRule] = [
+        ModelRoutingRule(model="gpt-3.5-turbo", max_length=200)
+    ]
+    # A routed model over either budget is skipped for MODEL_COOLDOWN_SECONDS,
+    # then tried again with a fresh stats window
+    MODEL_LATENCY_BUDGET_SECONDS: float = 20.0
+    MODEL_ERROR_BUDGET: float = 0.2
+    MODEL_COOLDOWN_SECONDS: float = 60.0
+    MODEL_STATS_WINDOW: int = 100
+    # USD per 1K (prompt, completion) tokens
+    MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+        "gpt-3.5-turbo": (0.0005, 0.0015),
+        "ft:gpt-3.5-turbo-0125:personal::9hpCfvVt": (0.003, 0.006)
+    }
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,88 @@
+import math
+from typing import Tuple
+
+
+class Overloaded(Exception):
+    """Raised when admitting more work would exceed the queue-time limit"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """Paragraphs admitted for one request or job, released as they finish"""
+
+    def __init__(self, controller: "AdmissionController", units: int):
+        self.controller = controller
+        self.remaining = units
+
+    def done(self, units: int = 1) -> None:
+        units = min(units, self.remaining)
+        self.remaining -= units
+        self.controller.pending -= units
+
+    def close(self) -> None:
+        self.done(self.remaining)
+
+
+class AdmissionController:
+    """Admission control from queue depth and observed upstream throughput
+
+    Throughput follows Little's law: concurrent upstream slots divided by the
+    smoothed time one paragraph spends upstream.
+    """
+
+    def __init__(self, slots: int, max_queue_seconds: float, initial_service_time: float, smoothing: float = 0.2):
+        self.slots = slots
+        self.max_queue_seconds = max_queue_seconds
+        self.service_time = initial_service_time
+        self.smoothing = smoothing
+        self.pending = 0
+
+    @property
+    def throughput(self) -> float:
+        """Paragraphs per second"""
+        return self.slots / self.service_time
+
+    def estimated_wait(self) -> float:
+        return self.pending / self.throughput
+
+    def record_service_time(self, seconds: float) -> None:
+        self.service_time += self.smoothing * (seconds - self.service_time)
+
+    def check(self) -> None:
+        """Raise Overloaded if the queued work alone already exceeds max_queue_seconds
+
+        Cheap enough to call before a request does any expensive work of its own.
+        """
+        wait = self.estimated_wait()
+        if wait > self.max_queue_seconds:
+            raise Overloaded(max(1, math.ceil(wait - self.max_queue_seconds)))
+
+    def admit(self, units: int, concurrency: int = 1) -> Tuple[Reservation, float, float]:
+        """Reserve `units` paragraphs, returning the estimated start and finish delays
+
+        `concurrency` is how many of the request's paragraphs run upstream at
+        once; a document rewritten in order only ever holds one slot.
+
+        Raises Overloaded when the queued work plus `units` would exceed
+        max_queue_seconds. A request too large to ever fit is still admitted
+        when nothing else is queued.
+        """
+        wait = self.estimated_wait()
+        queued = (self.pending + units) / self.throughput
+        if self.pending and queued > self.max_queue_seconds:
+            raise Overloaded(max(1, math.ceil(queued - self.max_queue_seconds)))
+
+        self.pending += units
+        request_throughput = min(max(concurrency, 1), self.slots) / self.service_time
+        return Reservation(self, units), wait, wait + units / request_throughput
+
+    def snapshot(self) -> dict:
+        return {
+            "pending_paragraphs": self.pending,
+            "service_time": self.service_time,
+            "throughput": self.throughput,
+            "estimated_wait": self.estimated_wait()
+        }
@@ -0,0 +1,86 @@
+from typing import Dict, List, Tuple
+import re
+
+import numpy as np
+
+# Feature weights: length drift, content recall, verbatim copying, repetition, artifacts
+LENGTH_WEIGHT = 1.0
+RECALL_WEIGHT = 1.0
+COPY_WEIGHT = 2.0
+REPETITION_WEIGHT = 2.0
+ARTIFACT_WEIGHT = 1.5
+
+# Share of the original's bigrams a rewrite may reuse before it counts as copying
+COPY_ALLOWANCE = 0.7
+
+ARTIFACT_PATTERNS = [
+    re.compile(r"^\s*(here is|here's|sure|certainly|rewritten|revised)\b", re.IGNORECASE),
+    re.compile(r"\bas an ai\b", re.IGNORECASE),
+    re.compile(r"\*\*|^#+\s", re.MULTILINE),
+    re.compile(r"^\s*[\"'].*[\"']\s*$", re.DOTALL),
+    re.compile(r"\b(rewrite|style)\s*:", re.IGNORECASE)
+]
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def _ngrams(words: List[str], n: int) -> List[Tuple[str, ...]]:
+    return [tuple(words[i:i + n]) for i in range(len(words) - n + 1)]
+
+
+def _count_matrix(docs: List[List[Tuple[str, ...]]]) -> np.ndarray:
+    """Rows are documents, columns are n-grams, values are counts"""
+    vocabulary: Dict[Tuple[str, ...], int] = {}
+    rows, cols = [], []
+    for row, grams in enumerate(docs):
+        for gram in grams:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(gram, len(vocabulary)))
+
+    counts = np.zeros((len(docs), max(len(vocabulary), 1)))
+    np.add.at(counts, (np.array(rows, dtype=int), np.array(cols, dtype=int)), 1)
+    return counts
+
+
+def _recall(candidates: np.ndarray, original: np.ndarray) -> np.ndarray:
+    """Share of the original's n-grams each candidate reproduces"""
+    total = original.sum()
+    if total == 0:
+        return np.zeros(candidates.shape[0])
+    return np.minimum(candidates, original).sum(axis=1) / total
+
+
+def score_candidates(original: str, candidates: List[str]) -> np.ndarray:
+    """Score rewrite candidates against their original; higher is better"""
+    original_words = _words(original)
+    candidate_words = [_words(c) for c in candidates]
+
+    unigrams = _count_matrix([_ngrams(w, 1) for w in [original_words] + candidate_words])
+    bigrams = _count_matrix([_ngrams(w, 2) for w in [original_words] + candidate_words])
+    trigrams = _count_matrix([_ngrams(w, 3) for w in candidate_words])
+
+    lengths = unigrams[1:].sum(axis=1)
+    length_drift = np.abs(np.log(np.maximum(lengths, 1) / max(len(original_words), 1)))
+    recall = _recall(unigrams[1:], unigrams[0])
+    copying = np.maximum(_recall(bigrams[1:], bigrams[0]) - COPY_ALLOWANCE, 0)
+
+    trigram_totals = trigrams.sum(axis=1)
+    repetition = (trigram_totals - (trigrams > 0).sum(axis=1)) / np.maximum(trigram_totals, 1)
+
+    artifacts = np.array([
+        sum(bool(pattern.search(c)) for pattern in ARTIFACT_PATTERNS) for c in candidates
+    ], dtype=float) / len(ARTIFACT_PATTERNS)
+
+    features = np.column_stack([length_drift, recall, copying, repetition, artifacts])
+    weights = np.array([-LENGTH_WEIGHT, RECALL_WEIGHT, -COPY_WEIGHT, -REPETITION_WEIGHT, -ARTIFACT_WEIGHT])
+    return features @ weights
+
+
+def select_best_candidate(original: str, candidates: List[str]) -> str:
+    if len(candidates) == 1:
+        return candidates[0]
+    return candidates[int(np.argmax(score_candidates(original, candidates)))]
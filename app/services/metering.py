@@ -0,0 +1,122 @@
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional
+import asyncio
+import logging
+import secrets
+import sqlite3
+
+# API key of the request being served; copied into tasks it spawns
+current_api_key: ContextVar[Optional[str]] = ContextVar("current_api_key", default=None)
+
+USAGE_FIELDS = ("requests", "paragraphs", "prompt_tokens", "completion_tokens")
+
+
+class UsageStore:
+    """Per-API-key usage totals persisted in SQLite"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "api_key TEXT PRIMARY KEY, requests INTEGER NOT NULL DEFAULT 0, "
+                "paragraphs INTEGER NOT NULL DEFAULT 0, prompt_tokens INTEGER NOT NULL DEFAULT 0, "
+                "completion_tokens INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def load(self) -> Dict[str, Counter]:
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT api_key, {', '.join(USAGE_FIELDS)} FROM usage").fetchall()
+        return {row[0]: Counter(dict(zip(USAGE_FIELDS, row[1:]))) for row in rows}
+
+    def add(self, batch: Dict[str, Counter]) -> None:
+        """Add a batch of per-key increments in one transaction"""
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO usage (api_key, {', '.join(USAGE_FIELDS)}) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(api_key) DO UPDATE SET "
+                + ", ".join(f"{field} = {field} + excluded.{field}" for field in USAGE_FIELDS),
+                [(key, *(counts[field] for field in USAGE_FIELDS)) for key, counts in batch.items()]
+            )
+
+
+class UsageMeter:
+    """In-memory usage counters per API key, flushed to the store in batches
+
+    Only the configured `api_keys` are metered, so the counters and the store
+    stay bounded by that set. Without a store or keys, metering is disabled.
+
+    Recording and quota checks only touch local dicts; the store is written
+    once per flush interval, off the event loop.
+    """
+
+    def __init__(
+        self,
+        store: Optional[UsageStore],
+        flush_interval: float,
+        token_quota: int,
+        api_keys: Iterable[str]
+    ):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.token_quota = token_quota
+        self.api_keys = [key.encode("utf-8") for key in api_keys]
+        self.totals: Dict[str, Counter] = store.load() if store is not None else {}
+        self.unflushed: Dict[str, Counter] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None and bool(self.api_keys)
+
+    def is_valid_key(self, api_key: str) -> bool:
+        candidate = api_key.encode("utf-8")
+        # Check every key so the time taken doesn't reveal which one matched
+        matches = [secrets.compare_digest(candidate, key) for key in self.api_keys]
+        return any(matches)
+
+    def record(self, api_key: Optional[str] = None, **amounts: int) -> None:
+        """Add to the counters of `api_key`, or of the current request's key"""
+        api_key = api_key or current_api_key.get()
+        if api_key is None or not self.enabled:
+            return
+        self.totals.setdefault(api_key, Counter()).update(amounts)
+        self.unflushed.setdefault(api_key, Counter()).update(amounts)
+
+    def record_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.record(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def usage(self, api_key: str) -> Dict[str, int]:
+        counts = self.totals.get(api_key, Counter())
+        return {field: counts[field] for field in USAGE_FIELDS}
+
+    def over_quota(self, api_key: str) -> bool:
+        if not self.token_quota:
+            return False
+        counts = self.totals.get(api_key)
+        if counts is None:
+            return False
+        return counts["prompt_tokens"] + counts["completion_tokens"] >= self.token_quota
+
+    async def flush(self) -> None:
+        if not self.unflushed:
+            return
+        batch, self.unflushed = self.unflushed, {}
+        try:
+            await asyncio.to_thread(self.store.add, batch)
+        except Exception as e:
+            logging.error(f"Error flushing usage for {len(batch)} API keys: {e}")
+            for api_key, counts in batch.items():
+                self.unflushed.setdefault(api_key, Counter()).update(counts)
+
+    async def run(self) -> None:
+        """Flush periodically until cancelled, then flush what is left"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            await self.flush()
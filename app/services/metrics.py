@@ -0,0 +1,15 @@
+from collections import Counter
+from typing import Dict
+
+
+class ProcessingMetrics:
+    """In-process counters for document and paragraph processing"""
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.counters)
@@ -0,0 +1,168 @@
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+import time
+
+from app.core.config import settings, ModelRoutingRule
+
+# Budgets are only enforced once a model has this many recent calls
+MIN_BUDGET_SAMPLES = 10
+
+
+class ModelStats:
+    """Latency, error and token accounting for one model"""
+
+    def __init__(self, window: int):
+        self.recent: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        # Monotonic time until which the model is skipped for being over budget
+        self.excluded_until = 0.0
+
+    def error_rate(self) -> float:
+        if not self.recent:
+            return 0.0
+        return sum(error for _, error in self.recent) / len(self.recent)
+
+    def average_latency(self) -> float:
+        if not self.recent:
+            return 0.0
+        return sum(latency for latency, _ in self.recent) / len(self.recent)
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.recent:
+            return 0.0
+        latencies = sorted(latency for latency, _ in self.recent)
+        return latencies[min(int(len(latencies) * percentile), len(latencies) - 1)]
+
+
+class ModelRouter:
+    """Pick a model per chunk from routing rules and observed per-model budgets"""
+
+    def __init__(
+        self,
+        rules: List[ModelRoutingRule],
+        default_model: str,
+        latency_budget: float,
+        error_budget: float,
+        window: int,
+        pricing: Dict[str, Tuple[float, float]],
+        cooldown: float
+    ):
+        self.rules = rules
+        self.default_model = default_model
+        self.latency_budget = latency_budget
+        self.error_budget = error_budget
+        self.window = window
+        self.pricing = pricing
+        self.cooldown = cooldown
+        self.stats: Dict[str, ModelStats] = {}
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        return cls(
+            rules=settings.MODEL_ROUTING_RULES,
+            default_model=settings.GPT_MODEL,
+            latency_budget=settings.MODEL_LATENCY_BUDGET_SECONDS,
+            error_budget=settings.MODEL_ERROR_BUDGET,
+            window=settings.MODEL_STATS_WINDOW,
+            pricing=settings.MODEL_PRICING,
+            cooldown=settings.MODEL_COOLDOWN_SECONDS
+        )
+
+    def _matches(self, rule: ModelRoutingRule, text: str, style: str) -> bool:
+        length = len(text)
+        if rule.min_length is not None and length < rule.min_length:
+            return False
+        if rule.max_length is not None and length > rule.max_length:
+            return False
+        if rule.styles is not None and style not in rule.styles:
+            return False
+        return True
+
+    def within_budget(self, model: str) -> bool:
+        """Whether `model` may be routed to
+
+        A model found over budget is skipped for `cooldown` seconds. After that
+        its recent window is cleared, so it gets traffic again and is judged
+        afresh once it has MIN_BUDGET_SAMPLES new calls.
+        """
+        stats = self.stats.get(model)
+        if stats is None:
+            return True
+
+        if stats.excluded_until:
+            if time.monotonic() < stats.excluded_until:
+                return False
+            stats.excluded_until = 0.0
+            stats.recent.clear()
+
+        if self._over_budget(stats):
+            stats.excluded_until = time.monotonic() + self.cooldown
+            return False
+        return True
+
+    def _over_budget(self, stats: ModelStats) -> bool:
+        return len(stats.recent) >= MIN_BUDGET_SAMPLES and (
+            stats.error_rate() > self.error_budget
+            or stats.average_latency() > self.latency_budget
+        )
+
+    def budget_status(self, model: str) -> bool:
+        """Whether within_budget would allow `model` now, without changing any state"""
+        stats = self.stats.get(model)
+        if stats is None:
+            return True
+        if stats.excluded_until:
+            return time.monotonic() >= stats.excluded_until
+        return not self._over_budget(stats)
+
+    def select(self, text: str, style: str) -> str:
+        """First matching rule whose model is within budget, else the default model"""
+        for rule in self.rules:
+            if self._matches(rule, text, style) and self.within_budget(rule.model):
+                return rule.model
+        return self.default_model
+
+    def record(
+        self,
+        model: str,
+        latency: float,
+        error: bool = False,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0
+    ) -> None:
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats(self.window)
+
+        stats.recent.append((latency, error))
+        stats.calls += 1
+        stats.errors += error
+        stats.total_latency += latency
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+
+        prompt_price, completion_price = self.pricing.get(model, (0.0, 0.0))
+        stats.cost += (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "recent_error_rate": stats.error_rate(),
+                "recent_average_latency": stats.average_latency(),
+                "recent_p95_latency": stats.latency_percentile(0.95),
+                "average_latency": stats.total_latency / stats.calls if stats.calls else 0.0,
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "cost": stats.cost,
+                "within_budget": self.budget_status(name),
+                "cooldown_remaining": max(stats.excluded_until - time.monotonic(), 0.0)
+            }
+            for name, stats in self.stats.items()
+        }
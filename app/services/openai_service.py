@@ -1,27 +1,58 @@
 from openai import AsyncOpenAI
 import logging
 import os
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.candidate_scorer import select_best_candidate
+from app.services.model_router import ModelRouter
+from app.services.metering import UsageMeter
 
 class OpenAIService:
-    def __init__(self):
+    def __init__(self, usage_meter: Optional[UsageMeter] = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
         self.client = AsyncOpenAI(api_key=self.api_key)
+        self.router = ModelRouter.from_settings()
+        self.usage_meter = usage_meter
 
-    async def rewrite_text_chunk(self, text: str, style: str = "scholar") -> str:
+    async def rewrite_text_chunk(self, text: str, style: str = "scholar", model: Optional[str] = None) -> str:
         if not text.strip():
             return text
+        model = model or self.router.select(text, style)
+        # With SELECT_BEST_SENTENCE, ask for several candidates in the same call
+        # and keep the one that scores best against the original
+        candidate_count = settings.CANDIDATE_COUNT if settings.SELECT_BEST_SENTENCE else 1
+        start_time = time.time()
         try:
             response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=model,
                 messages=[
                     {"role": "system", "content": f"You are a writing assistant specialized in {style} style."},
                     {"role": "user", "content": f"Rewrite the following text in {style} style:\n\n{text}"}
                 ],
-                temperature=0.7
+                temperature=0.7,
+                n=candidate_count
             )
-            return response.choices[0].message.content
         except Exception as e:
+            self.router.record(model, time.time() - start_time, error=True)
             logging.error(f"Error in OpenAI API call: {e}")
             raise
+
+        usage = response.usage
+        self.router.record(
+            model,
+            time.time() - start_time,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0
+        )
+        if self.usage_meter is not None and usage:
+            self.usage_meter.record_tokens(usage.prompt_tokens, usage.completion_tokens)
+        candidates = [c.message.content for c in response.choices if c.message.content]
+        if not candidates:
+            raise ValueError("OpenAI returned no content")
+        if len(candidates) == 1:
+            return candidates[0]
+        return select_best_candidate(text, candidates)
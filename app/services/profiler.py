@@ -0,0 +1,156 @@
+from collections import Counter, deque
+from datetime import datetime
+from types import FrameType
+from typing import Deque, List, Optional
+import asyncio
+import os
+import sys
+import threading
+import time
+import weakref
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame: Optional[FrameType]) -> List[str]:
+    """Frame labels from the outermost call to `frame`"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class SamplingProfiler:
+    """Time-bounded sampling of every thread's stack, one profile at a time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.lock.locked()
+
+    def profile(self, duration: float, interval: float) -> Counter:
+        """Sample for `duration` seconds; returns collapsed stack -> sample count
+
+        Blocks the calling thread, so run it off the event loop.
+        """
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            own_thread = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    thread_name = names.get(thread_id, str(thread_id))
+                    stacks[";".join([thread_name] + _stack(frame))] += 1
+                time.sleep(interval)
+            return stacks
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """Brendan Gregg's collapsed format, as read by flamegraph.pl and speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+class LoopLagMonitor:
+    """Detects event-loop stalls and captures the stack of whatever blocks the loop
+
+    A heartbeat task on the loop stamps the time every `interval`; a watchdog
+    thread notices when the stamp goes stale for longer than `threshold` and
+    snapshots the loop thread's stack while it is still blocked.
+    """
+
+    def __init__(self, threshold: float, interval: float, max_captures: int):
+        self.threshold = threshold
+        self.interval = interval
+        self.captures: Deque[dict] = deque(maxlen=max_captures)
+        self.task_labels: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+        self.last_beat = time.monotonic()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.stopped = threading.Event()
+
+    def label_current_task(self, label: str) -> None:
+        """Name the running task (e.g. by request) so stall captures can show it"""
+        task = asyncio.current_task()
+        if task is not None:
+            self.task_labels[task] = label
+
+    async def heartbeat(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                self.last_beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+        finally:
+            self.stopped.set()
+
+    def _describe_task(self) -> Optional[str]:
+        # Read from the watchdog thread while the loop is blocked, so the
+        # task it reports is the one holding the loop
+        task = asyncio.current_task(self.loop)
+        if task is None:
+            return None
+        label = self.task_labels.get(task)
+        if label is not None:
+            return label
+        return f"{task.get_name()} ({getattr(task.get_coro(), '__qualname__', '?')})"
+
+    def _watch(self) -> None:
+        capture = None
+        stalled_beat = None
+        while not self.stopped.wait(self.interval):
+            beat = self.last_beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.threshold:
+                capture = None
+                continue
+
+            if capture is not None and stalled_beat == beat:
+                capture["blocked_for"] = blocked_for
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread_id)
+            capture = {
+                "detected_at": datetime.now().isoformat(),
+                "blocked_for": blocked_for,
+                "task": self._describe_task(),
+                "stack": _stack(frame)
+            }
+            stalled_beat = beat
+            self.captures.append(capture)
+
+    def snapshot(self) -> List[dict]:
+        return list(self.captures)
+
+
+class TaskLabelMiddleware:
+    """Labels each request's task with its method and path for stall captures
+
+    A plain ASGI middleware, so the label lands on the task that also runs
+    the endpoint.
+    """
+
+    def __init__(self, app, monitor: LoopLagMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            self.monitor.label_current_task(f"{scope.get('method', 'WEBSOCKET')} {scope['path']}")
+        await self.app(scope, receive, send)
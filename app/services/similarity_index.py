@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from hashlib import blake2b
+from typing import Dict, List, Optional, Set, Tuple
+import re
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 2
+
+IndexKey = Tuple[str, str]
+
+
+def _tokens(text: str) -> List[str]:
+    return text.split()
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over lower-cased word shingles"""
+    words = [w.lower() for w in _tokens(text)]
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        value = int.from_bytes(blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def adapt_rewrite(stored_original: str, stored_rewrite: str, new_original: str) -> Optional[str]:
+    """Carry word-level substitutions between two originals over to a stored rewrite
+
+    Only handles replaced spans (changed dates, names, numbers) whose old text
+    appears exactly once in the rewrite. Returns None when the rewrite cannot be
+    adapted safely, e.g. when words were inserted or deleted.
+    """
+    old_words = _tokens(stored_original)
+    new_words = _tokens(new_original)
+    substitutions: Dict[str, str] = {}
+
+    matcher = SequenceMatcher(a=old_words, b=new_words, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if tag != "replace":
+            return None
+        old_span = " ".join(old_words[i1:i2])
+        new_span = " ".join(new_words[j1:j2])
+        if substitutions.get(old_span, new_span) != new_span:
+            return None
+        substitutions[old_span] = new_span
+
+    if not substitutions:
+        return stored_rewrite
+
+    patterns = {old: re.compile(rf"(?<!\w){re.escape(old)}(?!\w)") for old in substitutions}
+    if any(len(pattern.findall(stored_rewrite)) != 1 for pattern in patterns.values()):
+        return None
+
+    combined = re.compile("|".join(
+        pattern.pattern for _, pattern in sorted(patterns.items(), key=lambda item: -len(item[0]))
+    ))
+    return combined.sub(lambda match: substitutions[match.group(0)], stored_rewrite)
+
+
+class SimilarityIndex:
+    """Bounded SimHash index of rewritten paragraphs, partitioned by style and model
+
+    Candidates are found with LSH banding: the fingerprint is split into one
+    more band than the allowed Hamming distance, so by pigeonhole every
+    fingerprint within the threshold shares at least one band exactly.
+
+    Bands get narrower as the threshold drops: the default 0.85 allows a
+    distance of 9 bits, giving ten 6- and 7-bit bands. An unrelated
+    fingerprint matches some band with probability of roughly
+    6/64 + 4/128, so each lookup distance-checks about 12% of the entries in
+    its partition; `scanned_per_lookup` in stats() shows the observed share.
+    """
+
+    def __init__(self, max_entries: int, threshold: float):
+        self.max_entries = max_entries
+        self.max_distance = int((1.0 - threshold) * FINGERPRINT_BITS)
+        bands = min(self.max_distance + 1, FINGERPRINT_BITS)
+        self.band_bounds = [
+            (FINGERPRINT_BITS * i // bands, FINGERPRINT_BITS * (i + 1) // bands)
+            for i in range(bands)
+        ]
+
+        self.entries: "OrderedDict[int, Tuple[IndexKey, int, str, str]]" = OrderedDict()
+        self.buckets: Dict[Tuple[IndexKey, int, int], Set[int]] = {}
+        self.next_id = 0
+        self.lookups = 0
+        self.hits = 0
+        self.scanned = 0
+
+    def _bands(self, fingerprint: int):
+        for index, (start, end) in enumerate(self.band_bounds):
+            yield index, fingerprint >> start & ((1 << (end - start)) - 1)
+
+    def lookup(self, text: str, style: str, model: str) -> Optional[str]:
+        """Return a reusable rewrite for a near-duplicate of `text`, if any"""
+        self.lookups += 1
+        key = (style, model)
+        fingerprint = simhash(text)
+
+        candidate_ids: Set[int] = set()
+        for band, value in self._bands(fingerprint):
+            candidate_ids |= self.buckets.get((key, band, value), set())
+
+        self.scanned += len(candidate_ids)
+        candidates = []
+        for entry_id in candidate_ids:
+            _, stored_fingerprint, _, _ = self.entries[entry_id]
+            distance = bin(fingerprint ^ stored_fingerprint).count("1")
+            if distance <= self.max_distance:
+                candidates.append((distance, entry_id))
+
+        for _, entry_id in sorted(candidates):
+            _, _, original, rewritten = self.entries[entry_id]
+            adapted = adapt_rewrite(original, rewritten, text)
+            if adapted is not None:
+                self.entries.move_to_end(entry_id)
+                self.hits += 1
+                return adapted
+        return None
+
+    def add(self, text: str, rewritten: str, style: str, model: str) -> None:
+        key = (style, model)
+        fingerprint = simhash(text)
+        entry_id = self.next_id
+        self.next_id += 1
+
+        self.entries[entry_id] = (key, fingerprint, text, rewritten)
+        for band, value in self._bands(fingerprint):
+            self.buckets.setdefault((key, band, value), set()).add(entry_id)
+
+        while len(self.entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        entry_id, (key, fingerprint, _, _) = self.entries.popitem(last=False)
+        for band, value in self._bands(fingerprint):
+            bucket = self.buckets.get((key, band, value))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[(key, band, value)]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "reuse_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "scanned_per_lookup": self.scanned / self.lookups if self.lookups else 0.0
+        }
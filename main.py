@@ -1,18 +1,32 @@
-from fastapi import FastAPI, Request, HTTPException, Depends, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, Request, HTTPException, Depends, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, PlainTextResponse
+from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import time
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+from collections import OrderedDict
 from pydantic import BaseModel
 from app.core.config import settings
 from app.core.logging import setup_logging
 from app.services.openai_service import OpenAIService
+from app.services.metrics import ProcessingMetrics
+from app.services.similarity_index import SimilarityIndex
+from app.services.admission import AdmissionController, Overloaded, Reservation
+from app.services.metering import UsageMeter, UsageStore, current_api_key
+from app.services.profiler import SamplingProfiler, LoopLagMonitor, TaskLabelMiddleware
 import asyncio
 from datetime import datetime, timedelta
 import io
+import os
+import zipfile
 import docx
 import PyPDF2
 import uuid
+import hashlib
+import secrets
+import gzip
+import orjson
 from enum import Enum
 
 # Schema definitions
@@ -21,14 +35,7 @@ class JobStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
-
-class Job(BaseModel):
-    id: str
-    status: JobStatus
-    created_at: datetime
-    updated_at: datetime
-    result: Optional[dict] = None
-    error: Optional[str] = None
+    CANCELLED = "cancelled"
 
 class TextRequest(BaseModel):
     content: str
@@ -57,34 +64,241 @@ class DocumentResponse(BaseModel):
     total_sections: int
     processing_time: float
     word_count: int
+    style: Optional[str] = None
+    job_id: Optional[str] = None
+    reused_sections: int = 0
+
+class ChildJob(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    status: JobStatus = JobStatus.PENDING
+    total_paragraphs: int = 0
+    processed_paragraphs: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+class Job(BaseModel):
+    id: str
+    status: JobStatus
+    created_at: datetime
+    updated_at: datetime
+    version: int = 0
+    total_paragraphs: int = 0
+    processed_paragraphs: int = 0
+    partial_results: List[TextResponse] = []
+    children: List[ChildJob] = []
+    result: Optional[dict] = None
+    error: Optional[str] = None
 
 # Job queue manager
+FINAL_JOB_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED}
+
 class JobQueue:
     def __init__(self):
         self.jobs: Dict[str, Job] = {}
+        self.change_events: Dict[str, asyncio.Event] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # Finished jobs, serialized once and gzip-compressed
+        self.payloads: Dict[str, bytes] = {}
+        # Recently decoded payloads, so paging through a result doesn't re-parse it
+        self.decoded: "OrderedDict[str, dict]" = OrderedDict()
+        # Freezes running in worker threads, kept so they aren't garbage collected
+        self.freezing: Dict[str, asyncio.Task] = {}
 
-    def create_job(self) -> str:
+    def create_job(self, children: Optional[List[ChildJob]] = None) -> str:
         job_id = str(uuid.uuid4())
         self.jobs[job_id] = Job(
             id=job_id,
             status=JobStatus.PENDING,
             created_at=datetime.now(),
-            updated_at=datetime.now()
+            updated_at=datetime.now(),
+            children=children or []
         )
         return job_id
 
+    def _live_job(self, job_id: str) -> Optional[Job]:
+        """The job if it exists and has not reached a final status yet"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINAL_JOB_STATUSES:
+            return None
+        return job
+
+    def _notify(self, job_id: str):
+        """Bump the job version and wake every waiter of the previous one"""
+        job = self.jobs[job_id]
+        job.version += 1
+        job.updated_at = datetime.now()
+        event = self.change_events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _freeze(self, job_id: str):
+        """Store a finished job as compressed JSON and drop its in-memory result
+
+        The rewritten and cleaned texts of a section are usually identical and
+        sit next to each other in the JSON, so DEFLATE stores the second copy
+        as a back-reference even at a low compression level.
+
+        Serializing a large job takes long enough to stall the event loop, so
+        it runs in a worker thread; a finished job is no longer modified, and
+        until the payload is stored readers see the in-memory job instead.
+        """
+        job = self.jobs[job_id]
+
+        def encode() -> bytes:
+            return gzip.compress(orjson.dumps(job.dict()), compresslevel=settings.JOB_PAYLOAD_COMPRESSION_LEVEL)
+
+        def store(payload: bytes):
+            self.payloads[job_id] = payload
+            job.result = None
+            job.partial_results = []
+            job.children = []
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            store(encode())
+            return
+
+        async def freeze():
+            try:
+                store(await asyncio.to_thread(encode))
+            finally:
+                self.freezing.pop(job_id, None)
+
+        self.freezing[job_id] = asyncio.create_task(freeze())
+
     def update_job(self, job_id: str, status: JobStatus, result: Optional[dict] = None, error: Optional[str] = None):
-        if job_id in self.jobs:
-            self.jobs[job_id].status = status
-            self.jobs[job_id].updated_at = datetime.now()
+        job = self._live_job(job_id)
+        if job is not None:
+            job.status = status
             if result is not None:
-                self.jobs[job_id].result = result
+                job.result = result
+                job.partial_results = []
             if error is not None:
-                self.jobs[job_id].error = error
+                job.error = error
+            self._notify(job_id)
+            if status in FINAL_JOB_STATUSES:
+                self._freeze(job_id)
+
+    def set_total_paragraphs(self, job_id: str, total: int):
+        job = self._live_job(job_id)
+        if job is not None:
+            job.total_paragraphs = total
+            self._notify(job_id)
+
+    def add_partial_result(self, job_id: str, result: Optional[TextResponse]):
+        """Record one finished paragraph; failed paragraphs only advance the counter"""
+        job = self._live_job(job_id)
+        if job is not None:
+            job.processed_paragraphs += 1
+            if result is not None:
+                job.partial_results.append(result)
+            self._notify(job_id)
+
+    def update_child(self, job_id: str, index: int, **changes):
+        """Update fields of one child of a bulk job"""
+        job = self._live_job(job_id)
+        if job is not None:
+            child = job.children[index]
+            for field, value in changes.items():
+                setattr(child, field, value)
+            self._notify(job_id)
+
+    def add_child_progress(self, job_id: str, index: int):
+        job = self._live_job(job_id)
+        if job is not None:
+            job.children[index].processed_paragraphs += 1
+            job.processed_paragraphs += 1
+            self._notify(job_id)
 
     def get_job(self, job_id: str) -> Optional[Job]:
         return self.jobs.get(job_id)
 
+    def get_payload(self, job_id: str) -> Optional[bytes]:
+        """Gzip-compressed JSON of a finished job"""
+        return self.payloads.get(job_id)
+
+    def render_job(self, job_id: str) -> bytes:
+        """JSON of the job's current state"""
+        payload = self.payloads.get(job_id)
+        if payload is not None:
+            return gzip.decompress(payload)
+        return orjson.dumps(self.jobs[job_id].dict())
+
+    def render_snapshot(self, job_id: str) -> bytes:
+        """WebSocket message carrying the job's full current state"""
+        return b'{"type":"snapshot","job":' + self.render_job(job_id) + b'}'
+
+    def render_delta(self, job_id: str, sections_sent: int) -> bytes:
+        """WebSocket message with the counters and the sections after the first `sections_sent`"""
+        job = self.jobs[job_id]
+        return orjson.dumps({
+            "type": "update",
+            "version": job.version,
+            "status": job.status,
+            "updated_at": job.updated_at,
+            "total_paragraphs": job.total_paragraphs,
+            "processed_paragraphs": job.processed_paragraphs,
+            "new_sections": [r.dict() for r in job.partial_results[sections_sent:]],
+            "children": [child.dict(exclude={"result"}) for child in job.children]
+        })
+
+    def job_data(self, job_id: str) -> dict:
+        """The job's current state as a plain dict"""
+        if job_id not in self.payloads:
+            return self.jobs[job_id].dict()
+
+        data = self.decoded.get(job_id)
+        if data is None:
+            data = orjson.loads(gzip.decompress(self.payloads[job_id]))
+            self.decoded[job_id] = data
+            if len(self.decoded) > settings.JOB_DECODED_CACHE_SIZE:
+                self.decoded.popitem(last=False)
+        else:
+            self.decoded.move_to_end(job_id)
+        return data
+
+    def get_result(self, job_id: str) -> Optional[dict]:
+        if job_id not in self.jobs:
+            return None
+        return self.job_data(job_id)["result"]
+
+    def start_job(self, job_id: str, coro) -> asyncio.Task:
+        """Run `coro` as the job's task, keeping a handle so it can be cancelled"""
+        task = asyncio.create_task(coro)
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+        return task
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a pending or running job; False if it already finished"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINAL_JOB_STATUSES:
+            return False
+
+        for child in job.children:
+            if child.status not in FINAL_JOB_STATUSES:
+                child.status = JobStatus.CANCELLED
+        self.update_job(job_id, JobStatus.CANCELLED)
+        task = self.tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+        return True
+
+    async def wait_for_change(self, job_id: str, version: int, timeout: float) -> Optional[Job]:
+        """Return the job once its version moves past `version`, or after `timeout` seconds"""
+        job = self.jobs.get(job_id)
+        if job is None or job.version != version or job.status in FINAL_JOB_STATUSES:
+            return job
+
+        event = self.change_events.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.jobs.get(job_id)
+
 # Rate limiter (existing code)
 class RateLimiter:
     def __init__(self):
@@ -109,15 +323,15 @@ class RateLimiter:
         return False
 
 # Document processors (existing code)
-async def process_docx(file: bytes) -> List[str]:
+def process_docx(file: bytes) -> List[str]:
     doc = docx.Document(io.BytesIO(file))
     return [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
 
-async def process_pdf(file: bytes) -> List[str]:
+def process_pdf(file: bytes) -> List[str]:
     pdf = PyPDF2.PdfReader(io.BytesIO(file))
     return [page.extract_text() for page in pdf.pages]
 
-async def process_txt(file: bytes) -> List[str]:
+def process_txt(file: bytes) -> List[str]:
     text = file.decode('utf-8')
     return [p for p in text.split('\n\n') if p.strip()]
 
@@ -127,12 +341,78 @@ PROCESSORS = {
     'text/plain': process_txt
 }
 
+EXTENSION_CONTENT_TYPES = {
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.txt': 'text/plain'
+}
+
+ARCHIVE_CONTENT_TYPES = {'application/zip', 'application/x-zip-compressed'}
+
+async def extract_paragraphs(content: bytes, content_type: str) -> List[str]:
+    """Parse a document in a worker thread so large files don't stall the event loop"""
+    return await asyncio.to_thread(PROCESSORS[content_type], content)
+
+def unpack_archive(content: bytes, max_bytes: int, max_files: int) -> List[Tuple[str, bytes]]:
+    """Return (filename, content) for every file in a ZIP archive
+
+    Raises ValueError if the archive has more than `max_files` files, once the
+    uncompressed members add up to more than `max_bytes`, or when a member
+    cannot be read (encrypted or an unsupported compression method).
+    """
+    files = []
+    total_size = 0
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+        ]
+        if len(members) > max_files:
+            raise ValueError(f"Too many documents (max {settings.ARCHIVE_MAX_FILES})")
+        for info in members:
+            total_size += info.file_size
+            if total_size > max_bytes:
+                raise ValueError("Upload exceeds maximum total uncompressed size")
+            try:
+                files.append((info.filename, archive.read(info)))
+            except (RuntimeError, NotImplementedError) as e:
+                raise ValueError(f"Cannot read {info.filename}: {e}")
+    return files
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away before a synchronous request finishes"""
+
 # Initialize services
 setup_logging()
 logger = logging.getLogger(__name__)
-openai_service = OpenAIService()
+# The SQLite store is only created when there are keys to meter
+usage_meter = UsageMeter(
+    UsageStore(settings.USAGE_DB_PATH) if settings.USAGE_API_KEYS else None,
+    settings.USAGE_FLUSH_INTERVAL,
+    settings.USAGE_TOKEN_QUOTA,
+    settings.USAGE_API_KEYS
+)
+openai_service = OpenAIService(usage_meter=usage_meter)
 job_queue = JobQueue()
+profiler = SamplingProfiler()
+loop_monitor = LoopLagMonitor(
+    settings.LOOP_LAG_THRESHOLD_MS / 1000,
+    settings.LOOP_LAG_CHECK_INTERVAL_MS / 1000,
+    settings.LOOP_STALL_CAPTURES
+)
 limiter = RateLimiter()
+metrics = ProcessingMetrics()
+# Shared budget for concurrent upstream calls across all requests and jobs
+upstream_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_UPSTREAM_CALLS)
+admission = AdmissionController(
+    settings.MAX_CONCURRENT_UPSTREAM_CALLS,
+    settings.ADMISSION_MAX_QUEUE_SECONDS,
+    settings.ADMISSION_INITIAL_SERVICE_TIME
+)
+similarity_index = SimilarityIndex(
+    settings.SIMILARITY_INDEX_MAX_ENTRIES,
+    settings.SIMILARITY_THRESHOLD
+) if settings.SIMILARITY_REUSE_ENABLED else None
 
 async def rate_limit(request: Request):
     if await limiter.is_rate_limited(request):
@@ -141,6 +421,35 @@ async def rate_limit(request: Request):
             detail="Rate limit exceeded. Please try again in a minute."
         )
 
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+async def meter_usage(api_key: Optional[str] = Depends(api_key_header)):
+    """Require a valid API key, enforce its token quota and attribute usage to it
+
+    The request itself is counted by admit(), so requests rejected before or
+    during admission (bad input, 503 shedding) are not billed. A no-op while
+    no USAGE_API_KEYS are configured.
+    """
+    if not usage_meter.enabled:
+        return
+    if api_key is None or not usage_meter.is_valid_key(api_key):
+        raise HTTPException(status_code=401, detail="Valid X-API-Key header required")
+    if usage_meter.over_quota(api_key):
+        raise HTTPException(
+            status_code=429,
+            detail="Usage quota exceeded for this API key"
+        )
+    current_api_key.set(api_key)
+
+async def require_admin(api_key: Optional[str] = Depends(api_key_header)):
+    if (
+        not settings.ADMIN_API_KEY
+        or api_key is None
+        # Bytes, since compare_digest raises TypeError on non-ASCII str
+        or not secrets.compare_digest(api_key.encode(), settings.ADMIN_API_KEY.encode())
+    ):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -154,31 +463,223 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(TaskLabelMiddleware, monitor=loop_monitor)
+
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if usage_meter.enabled:
+        background_tasks.append(asyncio.create_task(usage_meter.run()))
+    if settings.LOOP_LAG_MONITOR_ENABLED:
+        background_tasks.append(asyncio.create_task(loop_monitor.heartbeat()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # Nobody is listening any more; 499 only shows up in our own access logs
+    return Response(status_code=499)
+
+def shed(e: Overloaded, work: str) -> HTTPException:
+    metrics.increment("requests_shed")
+    logger.warning(f"Shedding request for {work}: {e}")
+    return HTTPException(
+        status_code=503,
+        detail="Server is at capacity, please retry later",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def check_capacity():
+    """Reject with 503 before reading or parsing an upload if the queue is already full"""
+    try:
+        admission.check()
+    except Overloaded as e:
+        raise shed(e, "an unparsed upload")
+
+def admit(units: int, concurrency: int = 1) -> Tuple[Reservation, datetime, datetime]:
+    """Reserve upstream capacity for `units` paragraphs or reject with 503
+
+    Returns the reservation with the estimated start and finish times. An
+    admitted request counts towards the caller's metered usage.
+    """
+    try:
+        reservation, start_delay, finish_delay = admission.admit(units, concurrency)
+    except Overloaded as e:
+        raise shed(e, f"{units} paragraphs")
+    usage_meter.record(requests=1)
+    now = datetime.now()
+    return reservation, now + timedelta(seconds=start_delay), now + timedelta(seconds=finish_delay)
+
+async def parse_upload(content: bytes, content_type: str, min_length: int) -> List[str]:
+    """Paragraphs of an uploaded document, or 400 if it cannot be parsed
+
+    Parsing happens before admission so capacity is reserved for the real
+    paragraph count; it runs in a worker thread and is cheap next to the
+    upstream calls.
+    """
+    try:
+        paragraphs = await extract_paragraphs(content, content_type)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse document: {e}")
+    return [p for p in paragraphs if len(p) >= min_length]
+
+async def run_until_disconnected(request: Request, coro):
+    """Await `coro`, cancelling it as soon as the client disconnects"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling {request.url.path}")
+                task.cancel()
+                metrics.increment("requests_cancelled")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+# Paragraph processing
+async def rewrite_paragraph(paragraph: str, style: str) -> Optional[TextResponse]:
+    """Rewrite one paragraph within the shared upstream budget; None on failure
+
+    Near-duplicates of previously rewritten paragraphs reuse the stored rewrite
+    when the similarity index is enabled.
+    """
+    try:
+        para_start_time = time.time()
+        model = openai_service.router.select(paragraph, style)
+        rewritten = None
+        if similarity_index is not None:
+            rewritten = similarity_index.lookup(paragraph, style, model)
+            if rewritten is not None:
+                metrics.increment("paragraphs_reused")
+
+        if rewritten is None:
+            async with upstream_semaphore:
+                para_start_time = time.time()
+                rewritten = await openai_service.rewrite_text_chunk(
+                    paragraph,
+                    style=style,
+                    model=model
+                )
+            admission.record_service_time(time.time() - para_start_time)
+            usage_meter.record(paragraphs=1)
+            if similarity_index is not None:
+                similarity_index.add(paragraph, rewritten, style, model)
+
+        return TextResponse(
+            original=paragraph,
+            rewritten=rewritten,
+            cleaned=rewritten,
+            processing_time=time.time() - para_start_time
+        )
+    except Exception as e:
+        logger.error(f"Error processing paragraph: {e}")
+        return None
+
+def paragraph_hash(paragraph: str) -> str:
+    return hashlib.sha256(paragraph.encode('utf-8')).hexdigest()
+
+def previous_sections(previous_job_id: Optional[str], style: str) -> Dict[str, TextResponse]:
+    """Map content hash -> rewritten section for a previous revision's job
+
+    Sections are only carried over when the previous revision used the same style.
+    """
+    if previous_job_id is None:
+        return {}
+
+    job = job_queue.get_job(previous_job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Previous job not found")
+    if job.status != JobStatus.COMPLETED:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Previous job is {job.status.value}, not completed"
+        )
+    result = job_queue.get_result(previous_job_id)
+    if not result or "processed_content" not in result:
+        raise HTTPException(status_code=400, detail="Previous job has no document result")
+    if result.get("style") != style:
+        logger.info(f"Style changed since job {previous_job_id}, reprocessing all paragraphs")
+        return {}
+
+    return {
+        paragraph_hash(section["original"]): TextResponse(**section)
+        for section in result["processed_content"]
+    }
+
+def count_carried_over(paragraphs: List[str], carried_over: Optional[Dict[str, TextResponse]]) -> int:
+    if not carried_over:
+        return 0
+    return sum(paragraph_hash(p) in carried_over for p in paragraphs)
+
+async def rewrite_paragraphs(
+    paragraphs: List[str],
+    style: str,
+    job_id: Optional[str] = None,
+    carried_over: Optional[Dict[str, TextResponse]] = None,
+    reservation: Optional[Reservation] = None
+) -> List[TextResponse]:
+    """Rewrite paragraphs in order, reporting progress to `job_id` when given
+
+    Paragraphs whose content hash is in `carried_over` reuse that section
+    instead of being sent upstream. Each paragraph sent upstream is released
+    from `reservation` once it finishes.
+    """
+    results = []
+    completed = 0
+    try:
+        for paragraph in paragraphs:
+            response = None
+            if carried_over:
+                response = carried_over.get(paragraph_hash(paragraph))
+                if response is not None:
+                    metrics.increment("paragraphs_carried_over")
+            if response is None:
+                response = await rewrite_paragraph(paragraph, style)
+                if reservation is not None:
+                    reservation.done()
+            if response is not None:
+                results.append(response)
+            completed += 1
+            if job_id is not None:
+                job_queue.add_partial_result(job_id, response)
+    except asyncio.CancelledError:
+        metrics.increment("paragraphs_cancelled", len(paragraphs) - completed)
+        raise
+    return results
+
 # Background task processor
-async def process_document_task(job_id: str, file_content: bytes, filename: str, content_type: str, style: str, min_length: int):
+async def process_document_task(
+    job_id: str,
+    paragraphs: List[str],
+    filename: str,
+    content_type: str,
+    style: str,
+    carried_over: Optional[Dict[str, TextResponse]] = None,
+    reservation: Optional[Reservation] = None
+):
     try:
         job_queue.update_job(job_id, JobStatus.PROCESSING)
         
         start_time = time.time()
-        paragraphs = await PROCESSORS[content_type](file_content)
-        paragraphs = [p for p in paragraphs if len(p) >= min_length]
+        job_queue.set_total_paragraphs(job_id, len(paragraphs))
 
-        results = []
-        for paragraph in paragraphs:
-            try:
-                rewritten = await openai_service.rewrite_text_chunk(
-                    paragraph,
-                    style=style
-                )
-                results.append(TextResponse(
-                    original=paragraph,
-                    rewritten=rewritten,
-                    cleaned=rewritten,
-                    processing_time=0.0
-                ))
-            except Exception as e:
-                logger.error(f"Error processing paragraph in document: {e}")
-                continue
+        results = await rewrite_paragraphs(
+            paragraphs,
+            style,
+            job_id=job_id,
+            carried_over=carried_over,
+            reservation=reservation
+        )
 
         total_time = time.time() - start_time
         word_count = sum(len(p.split()) for p in paragraphs)
@@ -189,7 +690,10 @@ async def process_document_task(job_id: str, file_content: bytes, filename: str,
             processed_content=results,
             total_sections=len(results),
             processing_time=total_time,
-            word_count=word_count
+            word_count=word_count,
+            style=style,
+            job_id=job_id,
+            reused_sections=count_carried_over(paragraphs, carried_over)
         )
         
         job_queue.update_job(job_id, JobStatus.COMPLETED, result.dict())
@@ -197,14 +701,97 @@ async def process_document_task(job_id: str, file_content: bytes, filename: str,
         logger.error(f"Error processing document job {job_id}: {e}")
         job_queue.update_job(job_id, JobStatus.FAILED, error=str(e))
 
-@app.post("/process-async")
+async def parse_archive_documents(
+    documents: List[Tuple[str, Optional[str], bytes]],
+    min_length: int
+) -> List[Tuple[Optional[List[str]], Optional[str]]]:
+    """(paragraphs, None) for each parsed document, (None, error) for the rest"""
+    async def parse(filename: str, content_type: Optional[str], content: bytes):
+        if content_type not in PROCESSORS:
+            return None, "Unsupported file type"
+        try:
+            paragraphs = await extract_paragraphs(content, content_type)
+        except Exception as e:
+            logger.error(f"Error parsing {filename}: {e}")
+            return None, str(e)
+        return [p for p in paragraphs if len(p) >= min_length], None
+
+    return await asyncio.gather(*[
+        parse(filename, content_type, content)
+        for filename, content_type, content in documents
+    ])
+
+async def process_archive_task(
+    job_id: str,
+    documents: List[Tuple[str, Optional[str]]],
+    parsed: List[Optional[List[str]]],
+    style: str,
+    reservation: Optional[Reservation] = None
+):
+    """Process every parsed document of a bulk job through the shared upstream budget"""
+    try:
+        job_queue.update_job(job_id, JobStatus.PROCESSING)
+        start_time = time.time()
+        job_queue.set_total_paragraphs(job_id, sum(len(p) for p in parsed if p is not None))
+
+        async def process_file(index: int, paragraphs: List[str]):
+            filename, content_type = documents[index]
+            job_queue.update_child(job_id, index, status=JobStatus.PROCESSING, total_paragraphs=len(paragraphs))
+            file_start_time = time.time()
+
+            async def tracked(paragraph: str) -> Optional[TextResponse]:
+                response = await rewrite_paragraph(paragraph, style)
+                job_queue.add_child_progress(job_id, index)
+                if reservation is not None:
+                    reservation.done()
+                return response
+
+            responses = await asyncio.gather(*[tracked(p) for p in paragraphs])
+            results = [r for r in responses if r is not None]
+            result = DocumentResponse(
+                filename=filename,
+                content_type=content_type,
+                processed_content=results,
+                total_sections=len(results),
+                processing_time=time.time() - file_start_time,
+                word_count=sum(len(p.split()) for p in paragraphs)
+            )
+            job_queue.update_child(job_id, index, status=JobStatus.COMPLETED, result=result.dict())
+
+        try:
+            await asyncio.gather(*[
+                process_file(index, paragraphs)
+                for index, paragraphs in enumerate(parsed)
+                if paragraphs is not None
+            ])
+        except asyncio.CancelledError:
+            job = job_queue.get_job(job_id)
+            metrics.increment("paragraphs_cancelled", job.total_paragraphs - job.processed_paragraphs)
+            raise
+
+        children = job_queue.get_job(job_id).children
+        job_queue.update_job(job_id, JobStatus.COMPLETED, {
+            "total_files": len(children),
+            "completed_files": sum(c.status == JobStatus.COMPLETED for c in children),
+            "failed_files": sum(c.status == JobStatus.FAILED for c in children),
+            "processing_time": time.time() - start_time
+        })
+    except Exception as e:
+        logger.error(f"Error processing archive job {job_id}: {e}")
+        job_queue.update_job(job_id, JobStatus.FAILED, error=str(e))
+
+@app.post("/process-async", dependencies=[Depends(meter_usage)])
 async def process_document_async(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     style: Optional[str] = "scholar",
-    min_length: Optional[int] = 50
+    min_length: Optional[int] = 50,
+    previous_job_id: Optional[str] = None
 ):
-    """Process document asynchronously"""
+    """Process document asynchronously
+
+    With `previous_job_id`, only paragraphs that changed since that job's
+    revision are rewritten; the rest are carried over from its result.
+    """
     try:
         if file.content_type not in PROCESSORS:
             raise HTTPException(
@@ -212,31 +799,365 @@ async def process_document_async(
                 detail=f"Unsupported file type: {file.content_type}"
             )
 
+        carried_over = previous_sections(previous_job_id, style)
+        check_capacity()
         content = await file.read()
+        paragraphs = await parse_upload(content, file.content_type, min_length)
+        reservation, estimated_start, estimated_finish = admit(
+            len(paragraphs) - count_carried_over(paragraphs, carried_over)
+        )
         job_id = job_queue.create_job()
         
-        background_tasks.add_task(
-            process_document_task,
+        task = job_queue.start_job(job_id, process_document_task(
             job_id,
-            content,
+            paragraphs,
             file.filename,
             file.content_type,
             style,
-            min_length
-        )
+            carried_over,
+            reservation
+        ))
+        task.add_done_callback(lambda _: reservation.close())
         
-        return {"job_id": job_id, "status": "accepted"}
+        return {
+            "job_id": job_id,
+            "status": "accepted",
+            "estimated_start": estimated_start,
+            "estimated_finish": estimated_finish
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error initiating async document processing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/process-archive", dependencies=[Depends(meter_usage)])
+async def process_archive_async(
+    files: List[UploadFile] = File(...),
+    style: Optional[str] = "scholar",
+    min_length: Optional[int] = 50
+):
+    """Process many documents as one job
+
+    Accepts ZIP archives and/or individual TXT, DOCX and PDF uploads. Each
+    document becomes a child of the returned job with its own status and result.
+    """
+    try:
+        check_capacity()
+        documents = []
+        # One byte budget for the whole request: plain files and every archive's members
+        remaining_bytes = settings.ARCHIVE_MAX_TOTAL_BYTES
+        for file in files:
+            filename = file.filename or ""
+            # Read at most one byte past the budget, compressed or not
+            content = await file.read(remaining_bytes + 1)
+            if len(content) > remaining_bytes:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Upload exceeds maximum total uncompressed size"
+                )
+            if file.content_type in ARCHIVE_CONTENT_TYPES or filename.lower().endswith('.zip'):
+                try:
+                    members = await asyncio.to_thread(
+                        unpack_archive,
+                        content,
+                        remaining_bytes,
+                        settings.ARCHIVE_MAX_FILES - len(documents)
+                    )
+                except (zipfile.BadZipFile, ValueError) as e:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Invalid archive {filename}: {e}"
+                    )
+                for name, member_content in members:
+                    remaining_bytes -= len(member_content)
+                    extension = os.path.splitext(name)[1].lower()
+                    documents.append((name, EXTENSION_CONTENT_TYPES.get(extension), member_content))
+            else:
+                remaining_bytes -= len(content)
+                documents.append((filename, file.content_type, content))
+
+        if not documents:
+            raise HTTPException(status_code=400, detail="No documents to process")
+        if len(documents) > settings.ARCHIVE_MAX_FILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many documents: {len(documents)} (max {settings.ARCHIVE_MAX_FILES})"
+            )
+
+        parsed = await parse_archive_documents(documents, min_length)
+        # Archive paragraphs run concurrently, so the job can use every upstream slot
+        reservation, estimated_start, estimated_finish = admit(
+            sum(len(paragraphs) for paragraphs, _ in parsed if paragraphs is not None),
+            concurrency=settings.MAX_CONCURRENT_UPSTREAM_CALLS
+        )
+        job_id = job_queue.create_job(children=[
+            ChildJob(
+                filename=filename,
+                content_type=content_type,
+                status=JobStatus.FAILED if error is not None else JobStatus.PENDING,
+                error=error
+            )
+            for (filename, content_type, _), (_, error) in zip(documents, parsed)
+        ])
+        task = job_queue.start_job(
+            job_id,
+            process_archive_task(
+                job_id,
+                [(filename, content_type) for filename, content_type, _ in documents],
+                [paragraphs for paragraphs, _ in parsed],
+                style,
+                reservation
+            )
+        )
+        task.add_done_callback(lambda _: reservation.close())
+
+        return {
+            "job_id": job_id,
+            "status": "accepted",
+            "files": len(documents),
+            "estimated_start": estimated_start,
+            "estimated_finish": estimated_finish
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error initiating archive processing: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q-values like `gzip;q=0`"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0))) > 0
+
+def job_response(request: Request, job_id: str) -> Response:
+    """Serve a job, sending finished jobs' pre-compressed payload as-is to gzip clients"""
+    payload = job_queue.get_payload(job_id)
+    if payload is not None and accepts_gzip(request.headers.get("accept-encoding", "")):
+        return Response(
+            content=payload,
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        )
+    return Response(content=job_queue.render_job(job_id), media_type="application/json")
+
+def _plain(item) -> dict:
+    """A model of a live job as a dict; frozen jobs' entries already are"""
+    return item if isinstance(item, dict) else item.dict()
+
+def child_summary(child: dict) -> dict:
+    """A child of a bulk job without its sections"""
+    summary = dict(child)
+    if summary["result"] is not None:
+        summary["result"] = {k: v for k, v in summary["result"].items() if k != "processed_content"}
+    return summary
+
+def job_page(job_id: str, offset: int, limit: int, child: Optional[int] = None) -> bytes:
+    """JSON of the job with only entries [offset, offset + limit) of its content
+
+    For a bulk job, pages over its children (without their sections), or with
+    `child` over that child's processed_content. Otherwise pages over the final
+    result's processed_content once the job is finished, and over
+    partial_results while it is still running. Only the returned page is
+    serialized for a running job.
+    """
+    if job_queue.get_payload(job_id) is None:
+        job = job_queue.get_job(job_id)
+        data = job.dict(exclude={"partial_results", "children"})
+        partial_results, children = job.partial_results, job.children
+    else:
+        data = dict(job_queue.job_data(job_id))
+        partial_results, children = data.pop("partial_results"), data.pop("children")
+    data["partial_results"] = []
+    data["children"] = []
+
+    if child is not None:
+        if not 0 <= child < len(children):
+            raise HTTPException(status_code=404, detail="Child not found")
+        entry = _plain(children[child])
+        sections = entry["result"]["processed_content"] if entry["result"] is not None else []
+        if entry["result"] is not None:
+            entry["result"] = {**entry["result"], "processed_content": sections[offset:offset + limit]}
+        data["child"] = {"index": child, **entry}
+    elif children:
+        sections = children
+        data["children"] = [child_summary(_plain(c)) for c in children[offset:offset + limit]]
+    elif data["result"] is not None:
+        if "processed_content" not in data["result"]:
+            raise HTTPException(status_code=400, detail="Job result has no sections to paginate")
+        sections = data["result"]["processed_content"]
+        data["result"] = {**data["result"], "processed_content": sections[offset:offset + limit]}
+    else:
+        sections = partial_results
+        data["partial_results"] = [_plain(r) for r in sections[offset:offset + limit]]
+
+    next_offset = offset + limit
+    data["page"] = {
+        "offset": offset,
+        "limit": limit,
+        "total": len(sections),
+        "next_offset": next_offset if next_offset < len(sections) else None
+    }
+    return orjson.dumps(data)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
 @app.get("/job/{job_id}")
-async def get_job_status(job_id: str):
-    """Get job status and result"""
+async def get_job_status(
+    request: Request,
+    job_id: str,
+    version: Optional[int] = None,
+    wait: Optional[float] = None,
+    offset: Optional[int] = None,
+    limit: Optional[int] = None,
+    child: Optional[int] = None
+):
+    """Get job status and result
+
+    With `wait`, long-poll: hold the request for up to `wait` seconds until the
+    job version moves past `version` (the current version when omitted).
+
+    With `offset`/`limit`, return one page of sections; `page.next_offset` is
+    the cursor for the next page. Bulk jobs page over their children, and with
+    `child` over the sections of that child. Responses carry an ETag, and a matching
+    If-None-Match gets 304 Not Modified without a body.
+    """
+    job = job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if wait is not None and wait > 0:
+        timeout = min(wait, settings.JOB_LONG_POLL_MAX_SECONDS)
+        job = await job_queue.wait_for_change(
+            job_id,
+            job.version if version is None else version,
+            timeout
+        )
+
+    paginated = offset is not None or limit is not None or child is not None
+    if paginated:
+        offset = max(offset or 0, 0)
+        limit = min(max(limit or settings.JOB_PAGE_MAX_LIMIT, 1), settings.JOB_PAGE_MAX_LIMIT)
+        page_key = f"{offset}-{limit}" if child is None else f"child{child}-{offset}-{limit}"
+        etag = f'W/"{job_id}-{job.version}-{page_key}"'
+    else:
+        etag = f'W/"{job_id}-{job.version}"'
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if paginated:
+        response = Response(content=job_page(job_id, offset, limit, child), media_type="application/json")
+    else:
+        response = job_response(request, job_id)
+    response.headers["ETag"] = etag
+    return response
+
+@app.delete("/job/{job_id}")
+async def cancel_job(request: Request, job_id: str):
+    """Cancel a pending or running job, stopping its remaining upstream calls"""
     job = job_queue.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return job
+    if not job_queue.cancel_job(job_id):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job already {job.status.value}"
+        )
+
+    metrics.increment("jobs_cancelled")
+    logger.info(f"Cancelled job {job_id}")
+    return job_response(request, job_id)
+
+@app.websocket("/ws/job/{job_id}")
+async def job_updates(websocket: WebSocket, job_id: str):
+    """Push a full snapshot, then only what changed, then a final snapshot
+
+    Updates carry the counters and the sections finished since the previous
+    message, so a long job doesn't resend every earlier section on each change.
+    """
+    await websocket.accept()
+    job = job_queue.get_job(job_id)
+    if not job:
+        await websocket.close(code=4404, reason="Job not found")
+        return
+
+    try:
+        await websocket.send_text(job_queue.render_snapshot(job_id).decode('utf-8'))
+        sections_sent = len(job.partial_results)
+        while job.status not in FINAL_JOB_STATUSES:
+            version = job.version
+            while job.version == version and job.status not in FINAL_JOB_STATUSES:
+                job = await job_queue.wait_for_change(
+                    job_id, version, settings.JOB_LONG_POLL_MAX_SECONDS
+                )
+            if job.status in FINAL_JOB_STATUSES:
+                await websocket.send_text(job_queue.render_snapshot(job_id).decode('utf-8'))
+            else:
+                await websocket.send_text(job_queue.render_delta(job_id, sections_sent).decode('utf-8'))
+                sections_sent = len(job.partial_results)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Client disconnected from job {job_id} updates")
+
+@app.get("/usage")
+async def get_usage(api_key: Optional[str] = Depends(api_key_header)):
+    """Get metered usage and quota for the calling API key"""
+    if not usage_meter.enabled:
+        raise HTTPException(status_code=404, detail="Usage metering is disabled")
+    if api_key is None or not usage_meter.is_valid_key(api_key):
+        raise HTTPException(status_code=401, detail="Valid X-API-Key header required")
+    return {
+        **usage_meter.usage(api_key),
+        "token_quota": settings.USAGE_TOKEN_QUOTA or None
+    }
+
+@app.post("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile_process(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample every thread's stack for `seconds` and return collapsed stacks
+
+    The output can be fed to flamegraph.pl or loaded into speedscope.
+    """
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    seconds = min(max(seconds, 0.1), settings.PROFILE_MAX_SECONDS)
+    interval = max(interval_ms, 1.0) / 1000
+    try:
+        stacks = await asyncio.to_thread(profiler.profile, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        profiler.collapsed(stacks),
+        headers={"Content-Disposition": "attachment; filename=profile.collapsed"}
+    )
+
+@app.get("/admin/loop-stalls", dependencies=[Depends(require_admin)])
+async def get_loop_stalls():
+    """Get the most recent event-loop stalls with the stack that caused each"""
+    return {
+        "threshold_ms": settings.LOOP_LAG_THRESHOLD_MS,
+        "stalls": loop_monitor.snapshot()
+    }
 
 # Existing endpoints
 @app.get("/rate-limit-status")
@@ -261,32 +1182,50 @@ async def rate_limit_status(request: Request):
         "remaining_requests": max(0, limiter.CALLS - len(recent_requests))
     }
 
-@app.post("/process-text", response_model=TextResponse, dependencies=[Depends(rate_limit)])
-async def process_text(request: TextRequest):
+@app.get("/metrics")
+async def get_metrics():
+    """Get processing counters"""
+    return {
+        "counters": metrics.snapshot(),
+        "similarity_index": similarity_index.stats() if similarity_index is not None else None,
+        "models": openai_service.router.snapshot(),
+        "admission": admission.snapshot()
+    }
+
+@app.post("/process-text", response_model=TextResponse, dependencies=[Depends(rate_limit), Depends(meter_usage)])
+async def process_text(request: TextRequest, http_request: Request):
     """Process a single text input"""
     try:
         start_time = time.time()
         logger.info("Processing single text request")
         
-        rewritten = await openai_service.rewrite_text_chunk(
-            request.content,
-            style=request.style
-        )
+        reservation, _, _ = admit(1)
+        try:
+            response = await run_until_disconnected(
+                http_request,
+                rewrite_paragraph(request.content, request.style)
+            )
+        finally:
+            reservation.close()
+        if response is None:
+            raise HTTPException(status_code=500, detail="Error processing text")
         
         processing_time = time.time() - start_time
         
         return TextResponse(
             original=request.content,
-            rewritten=rewritten,
-            cleaned=rewritten,
+            rewritten=response.rewritten,
+            cleaned=response.cleaned,
             processing_time=processing_time
         )
+    except (HTTPException, ClientDisconnected):
+        raise
     except Exception as e:
         logger.error(f"Error processing text: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/process-paragraphs", response_model=ParagraphResponse, dependencies=[Depends(rate_limit)])
-async def process_paragraphs(request: ParagraphRequest):
+@app.post("/process-paragraphs", response_model=ParagraphResponse, dependencies=[Depends(rate_limit), Depends(meter_usage)])
+async def process_paragraphs(request: ParagraphRequest, http_request: Request):
     """Process text by paragraphs"""
     try:
         start_time = time.time()
@@ -295,24 +1234,14 @@ async def process_paragraphs(request: ParagraphRequest):
         paragraphs = [p.strip() for p in request.text.split("\n\n") if p.strip()]
         paragraphs = [p for p in paragraphs if len(p) >= request.min_paragraph_length]
 
-        results = []
-        for paragraph in paragraphs:
-            try:
-                para_start_time = time.time()
-                rewritten = await openai_service.rewrite_text_chunk(
-                    paragraph,
-                    style=request.style
-                )
-                
-                results.append(TextResponse(
-                    original=paragraph,
-                    rewritten=rewritten,
-                    cleaned=rewritten,
-                    processing_time=time.time() - para_start_time
-                ))
-            except Exception as e:
-                logger.error(f"Error processing paragraph: {e}")
-                continue
+        reservation, _, _ = admit(len(paragraphs))
+        try:
+            results = await run_until_disconnected(
+                http_request,
+                rewrite_paragraphs(paragraphs, request.style, reservation=reservation)
+            )
+        finally:
+            reservation.close()
 
         total_time = time.time() - start_time
         
@@ -321,17 +1250,27 @@ async def process_paragraphs(request: ParagraphRequest):
             total_paragraphs=len(results),
             processing_time=total_time
         )
+    except (HTTPException, ClientDisconnected):
+        raise
     except Exception as e:
         logger.error(f"Error in paragraph processing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/process", response_model=DocumentResponse, dependencies=[Depends(rate_limit)])
+@app.post("/process", response_model=DocumentResponse, dependencies=[Depends(rate_limit), Depends(meter_usage)])
 async def process_document(
+    http_request: Request,
     file: UploadFile = File(...),
     style: Optional[str] = "scholar",
-    min_length: Optional[int] = 50
+    min_length: Optional[int] = 50,
+    previous_job_id: Optional[str] = None,
+    keep_result: bool = False
 ):
-    """Process uploaded document"""
+    """Process uploaded document
+
+    With `keep_result`, the result is kept as a completed job so its `job_id`
+    can be passed as `previous_job_id` when a revised version is submitted.
+    Otherwise nothing is stored and `job_id` is null.
+    """
     try:
         start_time = time.time()
         logger.info(f"Processing document: {file.filename}")
@@ -342,39 +1281,41 @@ async def process_document(
                 detail=f"Unsupported file type: {file.content_type}"
             )
 
+        carried_over = previous_sections(previous_job_id, style)
+        check_capacity()
         content = await file.read()
-        paragraphs = await PROCESSORS[file.content_type](content)
-        paragraphs = [p for p in paragraphs if len(p) >= min_length]
+        paragraphs = await parse_upload(content, file.content_type, min_length)
 
-        results = []
-        for paragraph in paragraphs:
-            try:
-                rewritten = await openai_service.rewrite_text_chunk(
-                    paragraph,
-                    style=style
-                )
-                results.append(TextResponse(
-                    original=paragraph,
-                    rewritten=rewritten,
-                    cleaned=rewritten,
-                    processing_time=0.0
-                ))
-            except Exception as e:
-                logger.error(f"Error processing paragraph in document: {e}")
-                continue
+        reservation, _, _ = admit(len(paragraphs) - count_carried_over(paragraphs, carried_over))
+        try:
+            results = await run_until_disconnected(
+                http_request,
+                rewrite_paragraphs(paragraphs, style, carried_over=carried_over, reservation=reservation)
+            )
+        finally:
+            reservation.close()
 
         total_time = time.time() - start_time
         word_count = sum(len(p.split()) for p in paragraphs)
 
-        return DocumentResponse(
+        job_id = job_queue.create_job() if keep_result else None
+        result = DocumentResponse(
             filename=file.filename,
             content_type=file.content_type,
             processed_content=results,
             total_sections=len(results),
             processing_time=total_time,
-            word_count=word_count
+            word_count=word_count,
+            style=style,
+            job_id=job_id,
+            reused_sections=count_carried_over(paragraphs, carried_over)
         )
+        if job_id is not None:
+            job_queue.update_job(job_id, JobStatus.COMPLETED, result.dict())
+        return result
 
+    except (HTTPException, ClientDisconnected):
+        raise
     except Exception as e:
         logger.error(f"Error processing document: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,4 @@
+import os
+
+# main builds its OpenAI client at import time
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.admission import AdmissionController, Overloaded
+
+
+def make_controller() -> AdmissionController:
+    # 20 slots at 3s per paragraph: about 6.7 paragraphs per second overall
+    return AdmissionController(slots=20, max_queue_seconds=120.0, initial_service_time=3.0)
+
+
+def test_sequential_request_is_estimated_from_one_slot():
+    _, start, finish = make_controller().admit(10)
+    assert start == 0.0
+    assert finish == pytest.approx(30.0)
+
+
+def test_concurrent_request_is_estimated_from_its_slots():
+    _, _, finish = make_controller().admit(100, concurrency=20)
+    assert finish == pytest.approx(15.0)
+
+
+def test_incoming_units_count_towards_the_queue_limit():
+    controller = make_controller()
+    controller.admit(700)
+
+    with pytest.raises(Overloaded) as excinfo:
+        controller.admit(200)
+    assert excinfo.value.retry_after == 15
+    assert controller.pending == 700
+
+
+def test_oversized_request_is_admitted_when_idle():
+    controller = make_controller()
+    reservation, _, _ = controller.admit(5000)
+    assert controller.pending == 5000
+
+    reservation.close()
+    assert controller.pending == 0
+
+
+def test_check_rejects_only_on_queued_work():
+    controller = make_controller()
+    controller.admit(700)
+    controller.check()
+
+    controller = make_controller()
+    controller.admit(900)
+    with pytest.raises(Overloaded) as excinfo:
+        controller.check()
+    assert excinfo.value.retry_after == 15
@@ -0,0 +1,36 @@
+from app.services.candidate_scorer import score_candidates, select_best_candidate
+
+ORIGINAL = "The experiment showed that higher temperatures increase the reaction rate of the enzyme"
+GOOD = "The results indicate that the enzyme's reaction rate rises as temperature increases"
+
+
+def test_single_candidate_is_returned_unscored():
+    assert select_best_candidate(ORIGINAL, ["anything"]) == "anything"
+
+
+def test_scores_one_value_per_candidate():
+    assert score_candidates(ORIGINAL, [GOOD, ORIGINAL, ""]).shape == (3,)
+
+
+def test_prefers_rewrite_over_verbatim_copy():
+    assert select_best_candidate(ORIGINAL, [ORIGINAL, GOOD]) == GOOD
+
+
+def test_penalizes_assistant_artifacts():
+    chatty = "Sure! Here is the rewritten text: " + GOOD
+    assert select_best_candidate(ORIGINAL, [chatty, GOOD]) == GOOD
+
+
+def test_penalizes_repetition():
+    repeated = "the enzyme reaction rate the enzyme reaction rate the enzyme reaction rate rises"
+    assert select_best_candidate(ORIGINAL, [repeated, GOOD]) == GOOD
+
+
+def test_penalizes_large_length_drift():
+    truncated = "Temperature matters"
+    assert select_best_candidate(ORIGINAL, [truncated, GOOD]) == GOOD
+
+
+def test_empty_original_does_not_fail():
+    scores = score_candidates("", ["one candidate", "another candidate"])
+    assert scores.shape == (2,)
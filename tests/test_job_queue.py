@@ -0,0 +1,160 @@
+import asyncio
+import gzip
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+from main import ChildJob, DocumentResponse, JobQueue, JobStatus, TextResponse, accepts_gzip, job_page
+
+
+def section(i: int) -> TextResponse:
+    return TextResponse(original=f"original {i}", rewritten=f"rewritten {i}", cleaned=f"rewritten {i}", processing_time=0.1)
+
+
+def document(sections: int) -> dict:
+    return DocumentResponse(
+        filename="doc.txt",
+        content_type="text/plain",
+        processed_content=[section(i) for i in range(sections)],
+        total_sections=sections,
+        processing_time=1.0,
+        word_count=2 * sections
+    ).dict()
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = JobQueue()
+    monkeypatch.setattr(main, "job_queue", queue)
+    return queue
+
+
+def running_job(queue: JobQueue, sections: int) -> str:
+    job_id = queue.create_job()
+    queue.update_job(job_id, JobStatus.PROCESSING)
+    queue.set_total_paragraphs(job_id, sections)
+    for i in range(sections):
+        queue.add_partial_result(job_id, section(i))
+    return job_id
+
+
+def test_freeze_stores_payload_and_drops_in_memory_result(queue):
+    job_id = queue.create_job()
+    queue.update_job(job_id, JobStatus.COMPLETED, document(3))
+
+    payload = queue.get_payload(job_id)
+    assert payload is not None
+    assert queue.get_job(job_id).result is None
+    assert orjson.loads(gzip.decompress(payload))["result"]["total_sections"] == 3
+    assert queue.get_result(job_id)["processed_content"][2]["original"] == "original 2"
+
+
+def test_freeze_runs_off_the_event_loop(queue):
+    async def finish():
+        job_id = queue.create_job()
+        queue.update_job(job_id, JobStatus.COMPLETED, document(3))
+        assert queue.get_payload(job_id) is None
+        assert queue.get_result(job_id)["total_sections"] == 3
+        await asyncio.gather(*queue.freezing.values())
+        return job_id
+
+    job_id = asyncio.run(finish())
+    assert queue.get_payload(job_id) is not None
+    assert queue.freezing == {}
+
+
+def test_finished_job_ignores_late_updates(queue):
+    job_id = running_job(queue, 1)
+    queue.update_job(job_id, JobStatus.CANCELLED)
+    version = queue.get_job(job_id).version
+
+    queue.add_partial_result(job_id, section(1))
+    queue.update_job(job_id, JobStatus.FAILED, error="late")
+    assert queue.get_job(job_id).version == version
+    assert queue.job_data(job_id)["status"] == JobStatus.CANCELLED
+
+
+def test_get_result_of_unknown_job_is_none(queue):
+    assert queue.get_result("missing") is None
+
+
+def test_job_page_slices_running_job(queue):
+    job_id = running_job(queue, 5)
+    data = orjson.loads(job_page(job_id, 1, 2))
+
+    assert [r["original"] for r in data["partial_results"]] == ["original 1", "original 2"]
+    assert data["page"] == {"offset": 1, "limit": 2, "total": 5, "next_offset": 3}
+
+
+def test_job_page_slices_finished_result(queue):
+    job_id = queue.create_job()
+    queue.update_job(job_id, JobStatus.COMPLETED, document(5))
+    data = orjson.loads(job_page(job_id, 3, 10))
+
+    assert [r["original"] for r in data["result"]["processed_content"]] == ["original 3", "original 4"]
+    assert data["page"]["next_offset"] is None
+
+
+def test_job_page_of_bulk_job_pages_children_then_their_sections(queue):
+    job_id = queue.create_job(children=[ChildJob(filename=f"{i}.txt") for i in range(3)])
+    for i in range(3):
+        queue.update_child(job_id, i, status=JobStatus.COMPLETED, result=document(4))
+
+    running = orjson.loads(job_page(job_id, 0, 2))
+    assert [c["filename"] for c in running["children"]] == ["0.txt", "1.txt"]
+    assert "processed_content" not in running["children"][0]["result"]
+
+    queue.update_job(job_id, JobStatus.COMPLETED, {"total_files": 3})
+    data = orjson.loads(job_page(job_id, 1, 2, child=2))
+    assert data["child"]["index"] == 2
+    assert [r["original"] for r in data["child"]["result"]["processed_content"]] == ["original 1", "original 2"]
+    assert data["page"]["total"] == 4
+    assert data["children"] == []
+
+    with pytest.raises(HTTPException) as excinfo:
+        job_page(job_id, 0, 1, child=3)
+    assert excinfo.value.status_code == 404
+
+
+def test_cancel_job(queue):
+    async def cancel():
+        job_id = queue.create_job()
+        task = queue.start_job(job_id, asyncio.sleep(60))
+        await asyncio.sleep(0)
+        assert queue.cancel_job(job_id)
+        assert not queue.cancel_job(job_id)
+        await asyncio.gather(task, *queue.freezing.values(), return_exceptions=True)
+        return job_id, task
+
+    job_id, task = asyncio.run(cancel())
+    assert task.cancelled()
+    assert queue.job_data(job_id)["status"] == JobStatus.CANCELLED
+
+
+def test_etag_and_not_modified(queue):
+    job_id = running_job(queue, 3)
+    with TestClient(main.app) as client:
+        response = client.get(f"/job/{job_id}", params={"offset": 0, "limit": 2})
+        etag = response.headers["etag"]
+        assert response.status_code == 200
+        assert etag == f'W/"{job_id}-{queue.get_job(job_id).version}-0-2"'
+
+        cached = client.get(f"/job/{job_id}", params={"offset": 0, "limit": 2}, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        queue.add_partial_result(job_id, section(3))
+        changed = client.get(f"/job/{job_id}", params={"offset": 0, "limit": 2}, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+
+
+def test_accepts_gzip_honours_q_values():
+    assert accepts_gzip("gzip, deflate")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("gzip;q=0, deflate")
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip("*;q=0")
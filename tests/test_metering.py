@@ -0,0 +1,42 @@
+import asyncio
+
+from app.services.metering import UsageMeter, UsageStore
+
+
+def make_meter(tmp_path, api_keys, token_quota: int = 0) -> UsageMeter:
+    return UsageMeter(UsageStore(str(tmp_path / "usage.db")), 10.0, token_quota, api_keys)
+
+
+def test_only_configured_keys_are_valid(tmp_path):
+    meter = make_meter(tmp_path, ["key-a", "clé"])
+    assert meter.is_valid_key("key-a")
+    assert meter.is_valid_key("clé")
+    assert not meter.is_valid_key("key-b")
+    assert not meter.is_valid_key("")
+
+
+def test_metering_disabled_without_keys(tmp_path):
+    meter = make_meter(tmp_path, [])
+    meter.record("anything", requests=1)
+
+    assert not meter.enabled
+    assert meter.totals == {}
+
+
+def test_metering_disabled_without_store():
+    meter = UsageMeter(None, 10.0, 0, ["key-a"])
+    meter.record("key-a", requests=1)
+
+    assert not meter.enabled
+    assert meter.totals == {}
+    asyncio.run(meter.flush())
+
+
+def test_quota_and_flush(tmp_path):
+    meter = make_meter(tmp_path, ["key-a"], token_quota=100)
+    meter.record("key-a", requests=1, prompt_tokens=60, completion_tokens=40)
+    assert meter.over_quota("key-a")
+
+    asyncio.run(meter.flush())
+    assert meter.unflushed == {}
+    assert make_meter(tmp_path, ["key-a"]).usage("key-a")["prompt_tokens"] == 60
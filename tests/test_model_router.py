@@ -0,0 +1,67 @@
+from app.core.config import ModelRoutingRule
+from app.services import model_router
+from app.services.model_router import MIN_BUDGET_SAMPLES, ModelRouter
+
+
+def make_router() -> ModelRouter:
+    return ModelRouter(
+        rules=[ModelRoutingRule(model="small", max_length=200)],
+        default_model="default",
+        latency_budget=5.0,
+        error_budget=0.2,
+        window=50,
+        pricing={},
+        cooldown=60.0
+    )
+
+
+def test_routes_by_rule_and_falls_back_to_default():
+    router = make_router()
+    assert router.select("short text", "scholar") == "small"
+    assert router.select("x" * 500, "scholar") == "default"
+
+
+def test_model_over_budget_recovers_after_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_router.time, "monotonic", lambda: now[0])
+    router = make_router()
+    for _ in range(MIN_BUDGET_SAMPLES):
+        router.record("small", latency=1.0, error=True)
+
+    assert router.select("short text", "scholar") == "default"
+
+    now[0] += 30.0
+    assert router.select("short text", "scholar") == "default"
+
+    now[0] += 31.0
+    assert router.select("short text", "scholar") == "small"
+    assert len(router.stats["small"].recent) == 0
+
+
+def test_model_excluded_again_if_still_over_budget_after_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_router.time, "monotonic", lambda: now[0])
+    router = make_router()
+    for _ in range(MIN_BUDGET_SAMPLES):
+        router.record("small", latency=10.0)
+    assert not router.within_budget("small")
+
+    now[0] += 61.0
+    assert router.within_budget("small")
+    for _ in range(MIN_BUDGET_SAMPLES):
+        router.record("small", latency=10.0)
+    assert not router.within_budget("small")
+
+
+def test_snapshot_does_not_change_routing_state(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_router.time, "monotonic", lambda: now[0])
+    router = make_router()
+    for _ in range(MIN_BUDGET_SAMPLES):
+        router.record("small", latency=10.0)
+    assert not router.within_budget("small")
+
+    now[0] += 61.0
+    assert router.snapshot()["small"]["within_budget"]
+    assert router.stats["small"].excluded_until == 1060.0
+    assert len(router.stats["small"].recent) == MIN_BUDGET_SAMPLES
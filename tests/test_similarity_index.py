@@ -0,0 +1,88 @@
+from app.services.similarity_index import SimilarityIndex, adapt_rewrite, simhash
+
+ORIGINAL = (
+    "The committee met on 12 March 2021 to review the budget proposal "
+    "submitted by the finance department and approved it without changes"
+)
+REWRITE = (
+    "On 12 March 2021 the committee reviewed the finance department's "
+    "budget proposal and approved it as submitted"
+)
+
+
+def make_index(max_entries: int = 100) -> SimilarityIndex:
+    index = SimilarityIndex(max_entries=max_entries, threshold=0.85)
+    index.add(ORIGINAL, REWRITE, "scholar", "model-a")
+    return index
+
+
+def test_simhash_is_stable_and_close_for_small_edits():
+    edited = ORIGINAL.replace("2021", "2022")
+    assert simhash(ORIGINAL) == simhash(ORIGINAL)
+    assert bin(simhash(ORIGINAL) ^ simhash(edited)).count("1") <= 9
+
+
+def test_lookup_hit_carries_substitution_into_rewrite():
+    index = make_index()
+    edited = ORIGINAL.replace("2021", "2022")
+
+    assert index.lookup(edited, "scholar", "model-a") == REWRITE.replace("2021", "2022")
+    assert index.stats()["hits"] == 1
+
+
+def test_lookup_exact_duplicate_returns_stored_rewrite():
+    index = make_index()
+    assert index.lookup(ORIGINAL, "scholar", "model-a") == REWRITE
+
+
+def test_lookup_miss_for_unrelated_text():
+    index = make_index()
+    unrelated = "Photosynthesis converts light energy into chemical energy stored in glucose molecules"
+
+    assert index.lookup(unrelated, "scholar", "model-a") is None
+    assert index.stats()["hits"] == 0
+
+
+def test_lookup_is_partitioned_by_style_and_model():
+    index = make_index()
+    assert index.lookup(ORIGINAL, "casual", "model-a") is None
+    assert index.lookup(ORIGINAL, "scholar", "model-b") is None
+
+
+def test_oldest_entries_are_evicted():
+    index = make_index(max_entries=1)
+    index.add("An entirely different paragraph about rivers and lakes", "Rivers and lakes", "scholar", "model-a")
+
+    assert index.lookup(ORIGINAL, "scholar", "model-a") is None
+    assert len(index.entries) == 1
+
+
+def test_adapt_rewrite_rejects_inserted_words():
+    edited = ORIGINAL.replace("budget proposal", "revised budget proposal")
+    assert adapt_rewrite(ORIGINAL, REWRITE, edited) is None
+
+
+def test_adapt_rewrite_rejects_deleted_words():
+    edited = ORIGINAL.replace(" without changes", "")
+    assert adapt_rewrite(ORIGINAL, REWRITE, edited) is None
+
+
+def test_adapt_rewrite_rejects_span_occurring_more_than_once():
+    original = "The 2021 report covers sales in 2021 for the northern region"
+    rewrite = "Sales for 2021 in the northern region, per the 2021 report"
+    edited = "The 2022 report covers sales in 2021 for the northern region"
+
+    assert adapt_rewrite(original, rewrite, edited) is None
+
+
+def test_adapt_rewrite_rejects_span_missing_from_rewrite():
+    edited = ORIGINAL.replace("finance department", "legal department")
+    assert adapt_rewrite(ORIGINAL, REWRITE.replace("finance ", ""), edited) is None
+
+
+def test_adapt_rewrite_only_replaces_whole_words():
+    original = "Revenue grew 5 percent to 15 million"
+    rewrite = "Revenue rose 5 percent, reaching 15 million"
+    edited = "Revenue grew 6 percent to 15 million"
+
+    assert adapt_rewrite(original, rewrite, edited) == "Revenue rose 6 percent, reaching 15 million"